@@ -0,0 +1,99 @@
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+STAMP_FILENAME = ".batch_options.json"  # options of the last completed batch, kept in the output folder
+
+
+def is_up_to_date(input_path: str, output_path: str) -> bool:
+    """True if `output_path` exists and is at least as new as `input_path`."""
+    return os.path.exists(output_path) and os.path.getmtime(output_path) >= os.path.getmtime(input_path)
+
+
+@contextmanager
+def atomic_output(output_path: str) -> Iterator[str]:
+    """
+    Yield a temporary path next to `output_path` and move it into place only once
+    the block finishes, so an interrupted conversion never leaves a partial file
+    that `is_up_to_date` would then skip.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(output_path) or ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.chmod(tmp_path, 0o644)  # mkstemp creates owner-only files
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def read_stamp(output_folder: str) -> Optional[str]:
+    """Return the options recorded by the last completed batch into `output_folder`, if any."""
+    try:
+        with open(os.path.join(output_folder, STAMP_FILENAME)) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def write_stamp(output_folder: str, stamp: str) -> None:
+    """Record the options of a completed batch into `output_folder`."""
+    with atomic_output(os.path.join(output_folder, STAMP_FILENAME)) as tmp_path:
+        with open(tmp_path, "w") as f:
+            f.write(stamp)
+
+
+def run_batch(
+    convert_file: Callable[..., None],
+    input_folder: str,
+    output_folder: str,
+    workers: Optional[int] = None,
+    force: bool = False,
+    **kwargs,
+) -> None:
+    """
+    Run `convert_file(input_path, output_path, **kwargs)` over every CSV in
+    `input_folder` using a process pool, printing progress as files finish.
+
+    Files whose output is already newer than the input are skipped unless `force`,
+    or unless the converter or its options differ from the last completed batch.
+    `workers` defaults to the number of CPUs.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+
+    stamp = json.dumps({"convert_file": convert_file.__name__, "options": kwargs}, sort_keys=True, default=repr)
+    if read_stamp(output_folder) != stamp:
+        force = True  # existing outputs may have been made with other options
+
+    jobs = []
+    skipped = 0
+    for filename in sorted(os.listdir(input_folder)):
+        if not filename.endswith(".csv"):
+            continue
+        input_path = os.path.join(input_folder, filename)
+        output_path = os.path.join(output_folder, filename)
+        if not force and is_up_to_date(input_path, output_path):
+            skipped += 1
+            continue
+        jobs.append((input_path, output_path))
+
+    total = len(jobs)
+    print(f"{total} file(s) to convert, {skipped} up to date")
+    if not jobs:
+        write_stamp(output_folder, stamp)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(convert_file, input_path, output_path, **kwargs): input_path for input_path, output_path in jobs
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            future.result()  # re-raise any conversion error
+            print(f"[{done}/{total}] {os.path.basename(futures[future])}")
+
+    # Only once every file is converted, so a re-run after an interrupted change of options redoes them all
+    write_stamp(output_folder, stamp)
@@ -0,0 +1,50 @@
+"""
+Command line entry point for the batch converters.
+
+    python helpers_for_vanessa/batch_convert.py split-and-indexed "data/20250709 - Bedbug" --end-strip 30
+    python helpers_for_vanessa/batch_convert.py normalise-seconds "data/in" "data/in - normalised seconds"
+
+Files are converted in parallel (`--workers`, default: all CPUs) and skipped when
+their output is already newer than the input (`--force` to redo them). Changing an
+option such as `--end-strip` redoes every file.
+"""
+
+import argparse
+
+from normalise_and_seconds import normalise_and_seconds
+from split_and_indexed import split_and_indexed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch convert folders of sensor CSVs.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    split_parser = subparsers.add_parser("split-and-indexed", help="Keep the last N rows of each file and index them")
+    split_parser.add_argument("input_folder")
+    split_parser.add_argument("--end-strip", type=int, default=30, help="Number of rows to keep from the end")
+
+    normalise_parser = subparsers.add_parser("normalise-seconds", help="Recompute timestamp_s from timestamp")
+    normalise_parser.add_argument("input_folder")
+    normalise_parser.add_argument("output_folder")
+    normalise_parser.add_argument("--chunksize", type=int, default=100_000, help="Rows read per chunk")
+
+    for sub in (split_parser, normalise_parser):
+        sub.add_argument("--workers", type=int, default=None, help="Worker processes (default: all CPUs)")
+        sub.add_argument("--force", action="store_true", help="Convert files even if the output is up to date")
+
+    args = parser.parse_args()
+
+    if args.command == "split-and-indexed":
+        split_and_indexed(args.input_folder, end_strip=args.end_strip, workers=args.workers, force=args.force)
+    else:
+        normalise_and_seconds(
+            args.input_folder,
+            args.output_folder,
+            workers=args.workers,
+            force=args.force,
+            chunksize=args.chunksize,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,45 @@
-import os
+from typing import Optional
+
 import pandas as pd
 
+from batch import atomic_output, run_batch
+
 # Define input and output folders
 input_folder = "data/20250701 to 20250702"
 output_folder = "data/20250701 to 20250702 - normalised seconds"
 
-# Create output folder if it doesn't exist
-os.makedirs(output_folder, exist_ok=True)
 
-# Process each CSV file in the input folder
-for filename in os.listdir(input_folder):
-    if filename.endswith(".csv"):
-        input_path = os.path.join(input_folder, filename)
-        df = pd.read_csv(input_path)
+def normalise_and_seconds_file(input_path: str, output_path: str, chunksize: int = 100_000) -> None:
+    """Rewrite `timestamp_s` as whole seconds since the first `timestamp`, one chunk of rows at a time."""
+    first_timestamp = None
+
+    with atomic_output(output_path) as tmp_path, open(tmp_path, "w", newline="") as out:
+        # Read as text so the other columns are written back verbatim (per-chunk dtype inference could differ)
+        chunks = pd.read_csv(input_path, chunksize=chunksize, dtype=str, keep_default_na=False)
+        for chunk_idx, df in enumerate(chunks):
+            timestamps = pd.to_numeric(df["timestamp"])
+
+            # Normalize the timestamp against the file's first row
+            if first_timestamp is None:
+                first_timestamp = timestamps.iloc[0]
+            df["timestamp_s"] = ((
+                timestamps - first_timestamp
+            ) / 1000).astype(int)  # convert ms to seconds
+
+            df.to_csv(out, index=False, header=(chunk_idx == 0))
+
+
+def normalise_and_seconds(
+    input_folder: str,
+    output_folder: str,
+    workers: Optional[int] = None,
+    force: bool = False,
+    chunksize: int = 100_000,
+):
+    run_batch(normalise_and_seconds_file, input_folder, output_folder, workers=workers, force=force, chunksize=chunksize)
 
-        # Normalize the timestamp
-        first_timestamp = df["timestamp"].iloc[0]
-        df["timestamp_s"] = ((
-            df["timestamp"] - first_timestamp
-        ) / 1000).astype(int)  # convert ms to seconds
+    print("Normalization complete. Files saved in:", output_folder)
 
-        # Save the modified DataFrame to the output folder
-        output_path = os.path.join(output_folder, filename)
-        df.to_csv(output_path, index=False)
 
-print("Normalization complete. Files saved in:", output_folder)
+if __name__ == "__main__":
+    normalise_and_seconds(input_folder, output_folder)
@@ -1,28 +1,67 @@
+import io
 import os
+from typing import List, Optional, Tuple
+
 import pandas as pd
 
+from batch import atomic_output, run_batch
 
-def split_and_indexed(input_folder: str, end_strip: int = 30):
-    output_folder = f"{input_folder} - split and indexed"
-    os.makedirs(output_folder, exist_ok=True)
-    # Process each CSV file in the input folder
-    for filename in os.listdir(input_folder):
-        if filename.endswith(".csv"):
-            input_path = os.path.join(input_folder, filename)
-            df = pd.read_csv(input_path)
+READ_BLOCK_SIZE = 64 * 1024
+
+
+def read_tail_lines(input_path: str, n: int) -> Tuple[bytes, bytes, List[bytes]]:
+    """
+    Return the header line, the first data line and the last `n` data lines of a
+    file, reading backwards from the end in blocks instead of parsing the whole file.
+    """
+    with open(input_path, "rb") as f:
+        header = f.readline()
+        data_start = f.tell()
+        first_line = f.readline().rstrip(b"\r\n")
+        if n <= 0:
+            return header.rstrip(b"\r\n"), first_line, []
+
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        buffer = b""
+        # n lines need n + 1 newlines in view (the one ending the previous line included)
+        while position > data_start and buffer.count(b"\n") <= n + 1:
+            step = min(READ_BLOCK_SIZE, position - data_start)
+            position -= step
+            f.seek(position)
+            buffer = f.read(step) + buffer
 
-            # Keep only the last 30 rows
-            df = df.tail(end_strip).reset_index(drop=True)
+    lines = [line for line in buffer.splitlines() if line.strip()]
+    if position > data_start:
+        lines = lines[1:]  # first line may be cut partway through
+    return header.rstrip(b"\r\n"), first_line, lines[-n:]
 
-            # Remove the last column (assumed to be 'timestamp_ms')
-            df = df.iloc[:, :-1]
 
-            # Add index column from 1 to 30 at the front
-            df.insert(0, "index", range(1, len(df) + 1))
+def split_and_indexed_file(input_path: str, output_path: str, end_strip: int = 30) -> None:
+    """Keep the last `end_strip` rows of one CSV, drop its last column and add a 1-based index."""
+    header, first_line, lines = read_tail_lines(input_path, end_strip)
+    # Parse the first data line along with the tail so column dtypes are not inferred from the tail alone
+    prefix = [first_line] if first_line.strip() else []
+    df = pd.read_csv(io.BytesIO(b"\n".join([header] + prefix + lines))).iloc[len(prefix):].reset_index(drop=True)
 
-            # Save the modified DataFrame to the output folder
-            output_path = os.path.join(output_folder, filename)
-            df.to_csv(output_path, index=False)
+    # Remove the last column (assumed to be 'timestamp_ms')
+    df = df.iloc[:, :-1]
+
+    # Add index column from 1 to 30 at the front
+    df.insert(0, "index", range(1, len(df) + 1))
+
+    with atomic_output(output_path) as tmp_path:
+        df.to_csv(tmp_path, index=False)
+
+
+def split_and_indexed(
+    input_folder: str,
+    end_strip: int = 30,
+    workers: Optional[int] = None,
+    force: bool = False,
+):
+    output_folder = f"{input_folder} - split and indexed"
+    run_batch(split_and_indexed_file, input_folder, output_folder, workers=workers, force=force, end_strip=end_strip)
 
     print("Normalization complete. Files saved in:", output_folder)
 
@@ -0,0 +1,18 @@
+from utils.archive import build_archive, CampaignArchive
+
+import time
+
+# DEFINITIONS
+MASTER_FOLDER = "./data/20250813 - DEAD BEDBUG"
+
+# OPERATION AND CONTROL
+ARCHIVE_PATH = f"{MASTER_FOLDER}.bbarch"  # Single memory-mapped file holding every sensor CSV of the campaign
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    n_files = build_archive(MASTER_FOLDER, ARCHIVE_PATH)
+    print(f"Packed {n_files} files into {ARCHIVE_PATH} in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    archive = CampaignArchive(ARCHIVE_PATH)
+    print(f"Opened archive ({len(archive.filenames)} files) in {(time.perf_counter() - start) * 1000:.1f}ms")
@@ -1,18 +1,36 @@
 # IMPORTS
-from utils.n_plot import create_per_device_app, create_grouped_app
+from utils.n_plot import create_per_device_app, create_grouped_app, add_similarity_panel
 from utils.file_opener import (
     load_and_prepare_data_with_reference,
     load_and_prepare_data,
+    load_and_prepare_data_with_reference_chunked,
+    load_and_prepare_data_chunked,
     all_filenames_belonging_to_device,
+    use_archive,
 )
 from utils.data_processing import (
     apply_moving_average,
+    apply_moving_average_chunked,
     take_last_n_samples,
+    take_last_n_samples_chunked,
     drop_columns,
 )
+from utils.serving import (
+    DiskCache,
+    create_cached_app,
+    files_fingerprint,
+    fingerprint,
+    function_fingerprint,
+    serve_app,
+    source_fingerprint,
+)
+from utils.similarity import ExposureIndex, index_exposures
+from utils.drift import get_drift_model, load_and_prepare_data_with_drift_correction
 
-from typing import Dict
-from pandas import DataFrame
+from typing import Callable, Dict, List, Optional, Tuple
+from pandas import DataFrame, concat
+import numpy as np
+import os
 
 # DEFINITIONS
 DEVICE_IDS = [
@@ -24,23 +42,70 @@ DEVICE_IDS = [
     "E4B323F83080",
 ]  # example devices
 MASTER_FOLDER = "./data/20250813 - DEAD BEDBUG"
+ARCHIVE_PATH = None  # e.g. "./data/20250813 - DEAD BEDBUG.bbarch" (see main-build_archive.py) to read MASTER_FOLDER from a packed archive
 
 # OPERATION AND CONTROL
 
 USE_REFERENCING_TO_NORMALISE = True  # We use the last "EMPTY PETRI DISH" files to normalise the data
+USE_DRIFT_CORRECTION = False  # Instead normalise against a baseline fitted over time from ALL interleaved "EMPTY PETRI DISH" files (not with CHUNK_SIZE_ROWS)
 SHOW_RAW_LINES_NOT_BANDS = False  # Takes the average of a scenario (a given set of exposures by name) and plots that over the ghost of all instead.
 SHOW_ONLY_LAST_N_SAMPLES = 25  # Show only the last N samples on the graph
+REFERENCE_LAST_N_SAMPLES = 10  # Average this many samples at the end of the control file(s) as the reference
+COLUMNS_TO_DROP = ["BME688", "SGP41", "_R1"]  # Columns containing any of these substrings are removed
+MOVING_AVERAGE_WINDOW = 5  # Samples in the smoothing window
+CHUNK_SIZE_ROWS = None  # Stream each CSV in chunks of this many rows (bounded memory for long e.g. 24H logs), None to load whole files
+
+SERVE_FOR_PRODUCTION = False  # Serve to several users at once (gunicorn/waitress) instead of the debug server
+PRODUCTION_WORKERS = 4  # Worker processes (gunicorn) or threads (waitress) when serving for production
+CACHE_FOLDER = "./.cache"  # Shared on-disk cache of prepared data and figures
+CACHE_MAX_ENTRIES = 32  # Least recently used entries are evicted beyond this
+SHOW_SIMILARITY_PANEL = False  # Add a "find similar exposures" panel backed by a persistent fingerprint index
+SIMILARITY_INDEX_PATH = f"{CACHE_FOLDER}/exposure_index.npz"  # Shared across campaigns; new or changed exposures are (re)fit on start-up
 
 # Simple division
 NORMALIZATION_FUNCTION = lambda col_values, ref_value: (col_values / ref_value if ref_value != 0 else col_values)
 # Simple subtraction
 # NORMALIZATION_FUNCTION = lambda col_values, ref_value: (col_values - ref_value if ref_value != 0 else col_values)
 
+# Element-wise equivalents for USE_DRIFT_CORRECTION (values and baselines are rows x sensors arrays) - keep in step with the above
+# Simple division
+DRIFT_NORMALIZATION_FUNCTION = lambda values, baselines: np.divide(values, baselines, out=values.copy(), where=baselines != 0)
+# Simple subtraction
+# DRIFT_NORMALIZATION_FUNCTION = lambda values, baselines: np.subtract(values, baselines, out=values.copy(), where=baselines != 0)
+
+if USE_DRIFT_CORRECTION and CHUNK_SIZE_ROWS:
+    # Row times are anchored at each file's last row, which chunked loading only reaches at the end
+    raise ValueError("USE_DRIFT_CORRECTION cannot be combined with CHUNK_SIZE_ROWS; set one of them off")
+if SHOW_SIMILARITY_PANEL and CHUNK_SIZE_ROWS:
+    # Fingerprints need each exposure's whole series, which would defeat streaming long logs
+    raise ValueError("SHOW_SIMILARITY_PANEL cannot be combined with CHUNK_SIZE_ROWS; set one of them off")
+
 # WORKING VARIABLES
 
-data_dict: Dict[str, DataFrame] = {}
 
-for device_id in DEVICE_IDS:
+def load_device_chunked(test_files, control_file) -> DataFrame:
+    """Same preprocessing as `load_data_dict`, streaming each file in CHUNK_SIZE_ROWS row chunks."""
+    if USE_REFERENCING_TO_NORMALISE:
+        chunks = load_and_prepare_data_with_reference_chunked(
+            test_files,
+            control_file,
+            take_last_n=REFERENCE_LAST_N_SAMPLES,
+            normalize_fn=NORMALIZATION_FUNCTION,
+            chunksize=CHUNK_SIZE_ROWS,
+        )
+    else:
+        chunks = load_and_prepare_data_chunked(test_files, CHUNK_SIZE_ROWS)
+
+    chunks = (drop_columns(chunk, COLUMNS_TO_DROP) for chunk in chunks)
+
+    if SHOW_ONLY_LAST_N_SAMPLES:
+        # Only the tails are ever held in memory
+        return apply_moving_average(take_last_n_samples_chunked(chunks, SHOW_ONLY_LAST_N_SAMPLES), MOVING_AVERAGE_WINDOW)
+    return concat(apply_moving_average_chunked(chunks, MOVING_AVERAGE_WINDOW), ignore_index=True)
+
+
+def device_files(device_id: str) -> Tuple[str, List[str]]:
+    """Return the control (reference) file and the test files for one device."""
     # --- Get all control (empty petri dish) files ---
     control_files = all_filenames_belonging_to_device(
         device_id,
@@ -63,41 +128,150 @@ for device_id in DEVICE_IDS:
         # first_N=10
     )
 
+    return control_file, test_files
+
+
+def device_loader(device_id: str, cache: Optional[DiskCache] = None) -> Tuple[Callable[[List[str]], DataFrame], str]:
+    """
+    Return a function that loads and normalises test files of one device as configured,
+    plus a signature of the reference files and settings that normalisation depends on.
+    Fitted drift models are kept in `cache` if given.
+    """
+    control_file, _ = device_files(device_id)
+
+    if USE_DRIFT_CORRECTION:
+        # --- Normalize against the device's baseline at the time of each sample ---
+        all_control_files = all_filenames_belonging_to_device(
+            device_id,
+            MASTER_FOLDER,
+            include_list=["EMPTY PETRI DISH"],
+        )
+        drift_model = get_drift_model(all_control_files, take_last_n=REFERENCE_LAST_N_SAMPLES, cache=cache)  # refits only if controls change
+        load_fn = lambda files: load_and_prepare_data_with_drift_correction(
+            files, drift_model, normalize_fn=DRIFT_NORMALIZATION_FUNCTION
+        )
+        settings = fingerprint(
+            "drift",
+            files_fingerprint(all_control_files),
+            REFERENCE_LAST_N_SAMPLES,
+            function_fingerprint(DRIFT_NORMALIZATION_FUNCTION),
+        )
+        return load_fn, settings
+
     if USE_REFERENCING_TO_NORMALISE:
         # --- Load & normalize test files using device-specific control ---
-        df = load_and_prepare_data_with_reference(
-            test_files,
+        load_fn = lambda files: load_and_prepare_data_with_reference(
+            files,
             control_file,  # device-specific reference
-            take_last_n=10,
+            take_last_n=REFERENCE_LAST_N_SAMPLES,
             normalize_fn=NORMALIZATION_FUNCTION,
         )
-    else:
-        df = load_and_prepare_data(test_files)
+        settings = fingerprint(
+            "reference",
+            files_fingerprint([control_file]),
+            REFERENCE_LAST_N_SAMPLES,
+            function_fingerprint(NORMALIZATION_FUNCTION),
+        )
+        return load_fn, settings
 
-    # --- Standard preprocessing ---
-    df = drop_columns(df, ["BME688", "SGP41", "_R1"])
+    return load_and_prepare_data, "raw"
 
-    if SHOW_ONLY_LAST_N_SAMPLES:
-        df = take_last_n_samples(df, SHOW_ONLY_LAST_N_SAMPLES)
 
-    df = apply_moving_average(df, 5)
+def load_data_dict(cache: Optional[DiskCache] = None) -> Dict[str, DataFrame]:
+    data_dict: Dict[str, DataFrame] = {}
+
+    for device_id in DEVICE_IDS:
+        control_file, test_files = device_files(device_id)
+
+        if CHUNK_SIZE_ROWS:
+            df = load_device_chunked(test_files, control_file)
+        else:
+            load_fn, _ = device_loader(device_id, cache)
+            df = load_fn(test_files)
+
+            # --- Standard preprocessing ---
+            df = drop_columns(df, COLUMNS_TO_DROP)
+
+            if SHOW_ONLY_LAST_N_SAMPLES:
+                df = take_last_n_samples(df, SHOW_ONLY_LAST_N_SAMPLES)
+
+            df = apply_moving_average(df, MOVING_AVERAGE_WINDOW)
 
-    data_dict[df["device_id"].iloc[0]] = df
+        data_dict[df["device_id"].iloc[0]] = df
+
+    return data_dict
+
+
+if ARCHIVE_PATH:
+    use_archive(ARCHIVE_PATH, MASTER_FOLDER)
+
+cache = DiskCache(CACHE_FOLDER, max_entries=CACHE_MAX_ENTRIES)
+# Key on the input files, every setting that changes the prepared data and the code itself (this script + utils/)
+data_key = fingerprint(
+    files_fingerprint(all_filenames_belonging_to_device("", MASTER_FOLDER, include_list=[".csv"])),
+    source_fingerprint(__file__, os.path.join(os.path.dirname(os.path.abspath(__file__)), "utils")),
+    DEVICE_IDS,
+    USE_REFERENCING_TO_NORMALISE,
+    USE_DRIFT_CORRECTION,
+    SHOW_ONLY_LAST_N_SAMPLES,
+    REFERENCE_LAST_N_SAMPLES,
+    COLUMNS_TO_DROP,
+    MOVING_AVERAGE_WINDOW,
+    CHUNK_SIZE_ROWS,
+    function_fingerprint(NORMALIZATION_FUNCTION),
+    function_fingerprint(DRIFT_NORMALIZATION_FUNCTION),
+)
+cache_key = data_key
+load_cached_data = lambda: cache.get_or_build(f"data-{data_key}", lambda: load_data_dict(cache))  # only called on a layout cache miss
+
+similarity_index = None
+if SHOW_SIMILARITY_PANEL:
+    # --- Fingerprint exposures that are new or changed (file, reference or normalisation) ---
+    similarity_index = ExposureIndex(SIMILARITY_INDEX_PATH)
+    added = 0
+    for device_id in DEVICE_IDS:
+        _, test_files = device_files(device_id)
+        load_fn, settings = device_loader(device_id, cache)
+        added += index_exposures(
+            similarity_index,
+            os.path.basename(MASTER_FOLDER),
+            device_id,
+            test_files,
+            load_fn,
+            settings,
+        )
+    if added:
+        similarity_index.save()
+    # The panel's dropdown lists the indexed exposures, so the served layout depends on them
+    cache_key = fingerprint(cache_key, similarity_index.keys, similarity_index.sources)
+
+setup_app = (lambda app: add_similarity_panel(app, similarity_index)) if similarity_index is not None else None
 
 # --- Create Dash App ---
-titles = {device_id: f"Device {device_id}" for device_id in data_dict.keys()}
+titles = {device_id: f"Device {device_id}" for device_id in DEVICE_IDS}
 
 if SHOW_RAW_LINES_NOT_BANDS:
-    app = create_per_device_app(
-        data_dict,
+    app = create_cached_app(
+        create_per_device_app,
+        load_cached_data,
+        cache,
+        cache_key,
+        setup=setup_app,
         titles=titles,
         master_title="Sensor Comparison: Normalized to Device-Specific Controls",
     )
 else:
-    app = create_grouped_app(
-        data_dict,
+    app = create_cached_app(
+        create_grouped_app,
+        load_cached_data,
+        cache,
+        cache_key,
+        setup=setup_app,
         master_title="Sensor Comparison: Normalized to Device-Specific Controls",
     )
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    if SERVE_FOR_PRODUCTION:
+        serve_app(app, workers=PRODUCTION_WORKERS)
+    else:
+        app.run(debug=True)
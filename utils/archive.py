@@ -0,0 +1,203 @@
+import json
+import os
+import re
+import struct
+import tempfile
+from typing import Dict, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+from utils.file_opener import extract_device_id, extract_scenario, extract_timestamp
+
+MAGIC = b"BBARCH01"
+ALIGNMENT = 64  # every column array starts on a 64-byte boundary
+BUILD_CHUNK_ROWS = 100_000  # rows read at a time while packing
+
+
+def _is_sensor_file(filename: str) -> bool:
+    return filename.endswith(".csv") and re.search(r"\((.*?)\)-", filename) is not None
+
+
+def build_archive(folder: str, archive_path: str, chunksize: int = BUILD_CHUNK_ROWS) -> int:
+    """
+    Pack every sensor CSV of a campaign `folder` into one binary archive file.
+
+    Layout: magic, header length (uint64), JSON header, then one contiguous
+    fixed-dtype array per CSV column with all files' rows back to back. The header
+    holds the column dtypes/offsets and one metadata row per file (filename,
+    device_id, scenario, timestamp, row range, the dtypes `pd.read_csv` gives its
+    columns, and the source CSV's size and mtime for `stale_files`). Only numeric
+    (and boolean) columns can be packed. Returns the number of files packed.
+
+    Files are streamed in `chunksize` row chunks twice (layout, then data), so
+    memory stays bounded however large the campaign or its logs are.
+    """
+    filenames = sorted(f for f in os.listdir(folder) if _is_sensor_file(f))
+
+    # --- Pass 1: columns, row counts and each file's column dtypes ---
+    columns: List[str] = []  # column order of the first file, then extras in order of appearance
+    files = []
+    start = 0
+    for filename in filenames:
+        st = os.stat(os.path.join(folder, filename))  # before reading, so a rewrite during the build reads as stale
+        file_dtypes: Dict[str, np.dtype] = {}
+        n_rows = 0
+        for chunk in pd.read_csv(os.path.join(folder, filename), chunksize=chunksize):
+            if not len(chunk):
+                continue  # header-only file: columns (and their dtypes) are taken below
+            n_rows += len(chunk)
+            for col in chunk.columns:
+                if not pd.api.types.is_numeric_dtype(chunk[col]):
+                    raise ValueError(
+                        f"Cannot archive {filename}: column {col!r} is not numeric ({chunk[col].dtype}) "
+                        f"around rows {n_rows - len(chunk)}-{n_rows}"
+                    )
+                # As a whole-file read would infer it, e.g. int64 in one chunk and float64 (NaN) in another -> float64
+                dtype = chunk[col].dtype
+                file_dtypes[col] = np.result_type(file_dtypes[col], dtype) if col in file_dtypes else dtype
+        if not n_rows:
+            file_dtypes = dict(pd.read_csv(os.path.join(folder, filename), nrows=0).dtypes)
+        file_columns = list(file_dtypes)
+        columns += [c for c in file_columns if c not in columns]
+
+        files.append(
+            {
+                "filename": filename,
+                "device_id": extract_device_id(filename),
+                "scenario": extract_scenario(filename),
+                "timestamp": extract_timestamp(filename).isoformat(),
+                "columns": file_columns,
+                "dtypes": [np.dtype(file_dtypes[col]).str for col in file_columns],
+                "start": start,
+                "stop": start + n_rows,
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+            }
+        )
+        start += n_rows
+
+    # Integers are stored as int64 only if every file has them as integers (NaN for missing
+    # columns needs float64); each file's own dtype is restored on read
+    dtypes: Dict[str, np.dtype] = {}
+    for col in columns:
+        integer = all(
+            col in entry["columns"] and np.dtype(entry["dtypes"][entry["columns"].index(col)]).kind in "iu"
+            for entry in files
+        )
+        dtypes[col] = np.dtype(np.int64 if integer else np.float64)
+
+    # Offsets are relative to the (aligned) start of the data section
+    column_info = {}
+    offset = 0
+    for col, dtype in dtypes.items():
+        column_info[col] = {"dtype": dtype.str, "offset": offset}
+        offset += -(-(start * dtype.itemsize) // ALIGNMENT) * ALIGNMENT
+
+    header = json.dumps({"n_rows": start, "columns": column_info, "files": files}).encode("utf-8")
+    data_start = -(-(len(MAGIC) + 8 + len(header)) // ALIGNMENT) * ALIGNMENT
+
+    def write_column(f, col: str, row: int, values: np.ndarray) -> None:
+        f.seek(data_start + column_info[col]["offset"] + row * dtypes[col].itemsize)
+        f.write(np.ascontiguousarray(values, dtype=dtypes[col]).tobytes())
+
+    # --- Pass 2: write each file's rows into its preallocated slice of every column ---
+    out_folder = os.path.dirname(archive_path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=out_folder, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+            f.truncate(data_start + offset)
+            for entry in files:
+                row = entry["start"]
+                for chunk in pd.read_csv(os.path.join(folder, entry["filename"]), chunksize=chunksize):
+                    for col in columns:
+                        if col in chunk.columns:
+                            write_column(f, col, row, chunk[col].to_numpy(dtype=dtypes[col]))
+                        else:
+                            write_column(f, col, row, np.full(len(chunk), np.nan))
+                    row += len(chunk)
+        os.chmod(tmp_path, 0o644)  # readable by every process/user serving the campaign
+        os.replace(tmp_path, archive_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return len(files)
+
+
+class CampaignArchive:
+    """
+    Read-only, memory-mapped view of an archive from `build_archive`.
+
+    Opening only parses the small JSON header; column data is paged in by the OS
+    on first access and the pages are shared between every process that maps the
+    same file (Dash workers, batch jobs, ...). Frames returned by `read_csv` and
+    `read_csv_chunks` are views onto those pages, not copies: they are read-only,
+    so derive new columns/frames instead of assigning into them in place.
+    """
+
+    def __init__(self, archive_path: str):
+        self.path = archive_path
+        with open(archive_path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Not a campaign archive: {archive_path}")
+            (header_len,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_len))
+
+        data_start = -(-(len(MAGIC) + 8 + header_len) // ALIGNMENT) * ALIGNMENT
+        n_rows = header["n_rows"]
+        self._mmap = np.memmap(archive_path, dtype=np.uint8, mode="r")
+        self.columns: Dict[str, np.ndarray] = {
+            col: np.frombuffer(
+                self._mmap, dtype=np.dtype(info["dtype"]), count=n_rows, offset=data_start + info["offset"]
+            )
+            for col, info in header["columns"].items()
+        }
+        self._files = {entry["filename"]: entry for entry in header["files"]}
+
+        self.metadata = pd.DataFrame(
+            header["files"], columns=["filename", "device_id", "scenario", "timestamp", "start", "stop"]
+        )
+        self.metadata["timestamp"] = pd.to_datetime(self.metadata["timestamp"])
+
+    @property
+    def filenames(self) -> List[str]:
+        return list(self._files)
+
+    def __contains__(self, filename: str) -> bool:
+        return os.path.basename(filename) in self._files
+
+    def stale_files(self, folder: str) -> List[str]:
+        """Sensor CSVs in `folder` that are not packed, or were rewritten since the archive was built."""
+        stale = []
+        for filename in sorted(f for f in os.listdir(folder) if _is_sensor_file(f)):
+            entry = self._files.get(filename)
+            st = os.stat(os.path.join(folder, filename))
+            if entry is None or (entry.get("size"), entry.get("mtime_ns")) != (st.st_size, st.st_mtime_ns):
+                stale.append(filename)
+        return stale
+
+    def _slice(self, entry: dict, start: int, stop: int) -> Dict[str, np.ndarray]:
+        """Column values of rows start:stop, as views unless a column was widened when packing."""
+        columns = {}
+        for col, dtype in zip(entry["columns"], entry["dtypes"]):
+            values = self.columns[col][start:stop]
+            columns[col] = values if values.dtype == np.dtype(dtype) else values.astype(dtype)
+        return columns
+
+    def read_csv(self, filename: str) -> pd.DataFrame:
+        """Rows of one packed file, with the same columns (in order) and dtypes as `pd.read_csv` on the original."""
+        entry = self._files[os.path.basename(filename)]
+        return pd.DataFrame(self._slice(entry, entry["start"], entry["stop"]), copy=False)
+
+    def read_csv_chunks(self, filename: str, chunksize: int) -> Iterator[pd.DataFrame]:
+        """Like `pd.read_csv(..., chunksize=chunksize)`; chunk indexes continue across chunks."""
+        entry = self._files[os.path.basename(filename)]
+        for start in range(entry["start"], entry["stop"], chunksize):
+            stop = min(start + chunksize, entry["stop"])
+            yield pd.DataFrame(
+                self._slice(entry, start, stop),
+                index=pd.RangeIndex(start - entry["start"], stop - entry["start"]),
+                copy=False,
+            )
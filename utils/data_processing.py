@@ -1,5 +1,5 @@
 import pandas as pd
-from typing import List
+from typing import Dict, Iterable, Iterator, List
 
 
 def apply_moving_average(df: pd.DataFrame, window: int = 5) -> pd.DataFrame:
@@ -64,3 +64,56 @@ def drop_columns(df: pd.DataFrame, cols_to_drop: List[str]) -> pd.DataFrame:
         col for col in df.columns if any(sub in col for sub in cols_to_drop)
     ]
     return df.drop(columns=columns_to_remove, errors="ignore")
+
+
+# --- Chunked versions (for streams from `load_and_prepare_data_chunked`) ---
+
+
+def apply_moving_average_chunked(chunks: Iterable[pd.DataFrame], window: int = 5) -> Iterator[pd.DataFrame]:
+    """
+    Streaming `apply_moving_average`: yields smoothed chunks as they arrive.
+    The last `window - 1` rows of each scenario are carried over to the next
+    chunk, so results match smoothing the whole file at once.
+    """
+    carry: Dict[str, pd.DataFrame] = {}
+
+    for chunk in chunks:
+        numeric_cols = [
+            c
+            for c in chunk.columns
+            if c not in ["timestamp", "relative_time", "device_id", "scenario"]
+        ]
+        scenarios = chunk["scenario"].unique() if "scenario" in chunk.columns else ["default"]
+
+        for scenario in scenarios:
+            gdf = chunk[chunk["scenario"] == scenario] if scenario != "default" else chunk
+            values = gdf[numeric_cols]
+            if scenario in carry:
+                values = pd.concat([carry[scenario], values])
+
+            smoothed = gdf.copy()
+            smoothed[numeric_cols] = (
+                values.rolling(window=window, min_periods=1).mean().iloc[-len(gdf):].to_numpy()
+            )
+            carry[scenario] = values.tail(window - 1)
+            yield smoothed
+
+
+def take_last_n_samples_chunked(chunks: Iterable[pd.DataFrame], n: int = 10) -> pd.DataFrame:
+    """
+    Streaming `take_last_n_samples`: keeps only a running tail of `n` rows per
+    scenario while consuming `chunks`, then returns them combined.
+    """
+    tails: Dict[str, pd.DataFrame] = {}
+
+    for chunk in chunks:
+        scenarios = chunk["scenario"].unique() if "scenario" in chunk.columns else ["default"]
+        for scenario in scenarios:
+            gdf = chunk[chunk["scenario"] == scenario] if scenario != "default" else chunk
+            if scenario in tails:
+                gdf = pd.concat([tails[scenario], gdf])
+            tails[scenario] = gdf.tail(n)
+
+    combined = pd.concat(tails.values(), ignore_index=True)
+    combined["device_id"] = combined["device_id"].iloc[0]
+    return combined
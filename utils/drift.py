@@ -0,0 +1,110 @@
+import os
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+from utils.file_opener import extract_device_id, extract_scenario, extract_timestamp, load_and_prepare_data
+from utils.serving import DiskCache, files_fingerprint, fingerprint, source_fingerprint
+
+DRIFT_SENSORS = ["BME688_R", "ENS160_R0", "ENS160_R1", "ENS160_R2", "ENS160_R3"]
+
+# Default: simple division, element-wise (rows x sensors), leaving values untouched where the baseline is 0
+DRIFT_NORMALIZE_FN = lambda values, baselines: np.divide(values, baselines, out=values.copy(), where=baselines != 0)
+
+
+def exposure_row_times(df: pd.DataFrame, filenames: List[str]) -> np.ndarray:
+    """
+    Wall-clock time (seconds since epoch) of every row of a combined DataFrame.
+    The filename timestamp is when the file was saved, i.e. its last row, so rows
+    are placed backwards from there by relative_time.
+    """
+    end_times = {extract_scenario(file): extract_timestamp(file).timestamp() for file in filenames}
+    last_relative_time = df.groupby("scenario")["relative_time"].transform("max")
+    return (df["scenario"].map(end_times) - (last_relative_time - df["relative_time"])).to_numpy(dtype=float)
+
+
+class DriftModel:
+    """
+    Per-device baseline of each sensor over time, fitted from control (empty petri
+    dish) exposures. Between controls the baseline is linearly interpolated; before
+    the first and after the last control it is held constant.
+    """
+
+    def __init__(self, device_id: str, sensors: List[str], times: np.ndarray, baselines: np.ndarray):
+        self.device_id = device_id
+        self.sensors = sensors
+        self.times = times  # (n_controls,) seconds since epoch, ascending
+        self.baselines = baselines  # (n_controls, n_sensors)
+
+    def predict(self, times: np.ndarray) -> np.ndarray:
+        """Baseline of every sensor at each of `times`, shape (len(times), n_sensors)."""
+        return np.column_stack([np.interp(times, self.times, self.baselines[:, i]) for i in range(len(self.sensors))])
+
+
+def fit_drift_model(
+    control_files: List[str],
+    sensors: List[str] = DRIFT_SENSORS,
+    take_last_n: int = 10,
+) -> DriftModel:
+    """
+    Fit a `DriftModel` from all control files of one device: one baseline point per
+    control, the mean of its last `take_last_n` rows at their mean time.
+    """
+    if not control_files:
+        raise ValueError("At least one control file is needed to fit a drift model")
+
+    df = load_and_prepare_data(control_files)
+    df["time"] = exposure_row_times(df, control_files)
+    if take_last_n > 0:
+        df = df.groupby("scenario", sort=False).tail(take_last_n)
+
+    points = df.groupby("scenario", sort=False)[["time"] + sensors].mean().sort_values("time")
+    return DriftModel(
+        extract_device_id(control_files[0]),
+        sensors,
+        points["time"].to_numpy(dtype=float),
+        points[sensors].to_numpy(dtype=float),
+    )
+
+
+_fitted_models: Dict[str, DriftModel] = {}
+
+
+def get_drift_model(
+    control_files: List[str],
+    sensors: List[str] = DRIFT_SENSORS,
+    take_last_n: int = 10,
+    cache: Optional[DiskCache] = None,
+) -> DriftModel:
+    """
+    `fit_drift_model` with caching: fitted models are kept per process and, if
+    `cache` is given, on disk, keyed on the control files (names, sizes, mtimes),
+    settings and the fitting code. Re-plots only refit when one of them changes.
+    """
+    code = source_fingerprint(__file__, os.path.join(os.path.dirname(os.path.abspath(__file__)), "file_opener.py"))
+    key = f"drift-{fingerprint(files_fingerprint(control_files), sensors, take_last_n, code)}"
+    if key not in _fitted_models:
+        fit = lambda: fit_drift_model(control_files, sensors, take_last_n)
+        _fitted_models[key] = cache.get_or_build(key, fit) if cache is not None else fit()
+    return _fitted_models[key]
+
+
+def load_and_prepare_data_with_drift_correction(
+    filenames: List[str],
+    model: DriftModel,
+    normalize_fn=DRIFT_NORMALIZE_FN,
+) -> pd.DataFrame:
+    """
+    Load CSVs for a single device and normalize every row against the drift model's
+    baseline at that row's time, in one vectorized operation over all files.
+    `normalize_fn(values, baselines)` receives two (rows x sensors) arrays.
+    """
+    df = load_and_prepare_data(filenames)
+    df["device_id"] = model.device_id
+
+    cols = [col for col in model.sensors if col in df.columns]
+    baselines = model.predict(exposure_row_times(df, filenames))[:, [model.sensors.index(col) for col in cols]]
+    df[cols] = normalize_fn(df[cols].to_numpy(dtype=float), baselines)
+
+    return df
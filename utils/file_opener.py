@@ -1,7 +1,60 @@
 import pandas as pd
+import numpy as np
 import os
 import re
-from typing import List, Optional, Dict
+from typing import TYPE_CHECKING, Iterator, List, Optional, Dict
+
+if TYPE_CHECKING:
+    from utils.archive import CampaignArchive
+
+
+# --- Optional archive source (see utils/archive.py) ---
+
+# Campaign folder (normalised path) -> open CampaignArchive
+_archives: Dict[str, "CampaignArchive"] = {}
+
+
+def use_archive(archive_path: str, folder: str) -> None:
+    """
+    Read files of `folder` from a packed campaign archive instead of the CSVs.
+    All loaders below (and `all_filenames_belonging_to_device`) then use it
+    transparently; filenames keep their original form.
+
+    Raises ValueError if `folder` exists and holds sensor CSVs that are newer than,
+    or missing from, the archive (rebuild it with main-build_archive.py).
+    """
+    from utils.archive import CampaignArchive
+
+    archive = CampaignArchive(archive_path)
+    if os.path.isdir(folder):
+        stale = archive.stale_files(folder)
+        if stale:
+            raise ValueError(
+                f"Archive {archive_path} is out of date: {len(stale)} CSV(s) in {folder} were added or changed "
+                f"since it was built (e.g. {stale[0]}); rebuild it"
+            )
+    _archives[os.path.normpath(folder)] = archive
+
+
+def _archive_for(file: str):
+    archive = _archives.get(os.path.normpath(os.path.dirname(file)))
+    return archive if archive is not None and file in archive else None
+
+
+def source_path(file: str) -> str:
+    """The file actually read for `file`: its archive if it is packed in one, else the file itself."""
+    archive = _archive_for(file)
+    return archive.path if archive is not None else file
+
+
+def _read_csv(file: str) -> pd.DataFrame:
+    archive = _archive_for(file)
+    return archive.read_csv(file) if archive is not None else pd.read_csv(file)
+
+
+def _read_csv_chunks(file: str, chunksize: int) -> Iterator[pd.DataFrame]:
+    archive = _archive_for(file)
+    return archive.read_csv_chunks(file, chunksize) if archive is not None else pd.read_csv(file, chunksize=chunksize)
 
 
 def extract_device_id(filename: str) -> str:
@@ -18,6 +71,14 @@ def extract_scenario(filename: str) -> str:
     return scenario.strip()
 
 
+def extract_timestamp(filename: str) -> pd.Timestamp:
+    """Extract the save time from the '-YYYYMMDD_HHMMSS' after the device ID in the filename."""
+    match = re.search(r"\)-(\d{8}_\d{6})", os.path.basename(filename))
+    if not match:
+        raise ValueError(f"No timestamp in filename: {filename}")
+    return pd.to_datetime(match.group(1), format="%Y%m%d_%H%M%S")
+
+
 def all_filenames_belonging_to_device(
     device_id: str,
     folder: str,
@@ -55,8 +116,11 @@ def all_filenames_belonging_to_device(
     def natural_sort_key(s: str):
         return [int(text) if text.isdigit() else text.lower() for text in re.split(r"(\d+)", s)]
 
+    archive = _archives.get(os.path.normpath(folder))
+    listing = archive.filenames if archive is not None else os.listdir(folder)
+
     matching_files = []
-    for filename in sorted(os.listdir(folder), key=natural_sort_key):
+    for filename in sorted(listing, key=natural_sort_key):
         if device_id not in filename:
             continue
         if any(skip_str in filename for skip_str in skip_list):
@@ -65,7 +129,7 @@ def all_filenames_belonging_to_device(
             continue
 
         full_path = os.path.join(folder, filename)
-        if os.path.isfile(full_path):
+        if archive is not None or os.path.isfile(full_path):
             matching_files.append(full_path)
 
         if first_N is not None and len(matching_files) >= first_N:
@@ -83,7 +147,7 @@ def load_and_prepare_data(filenames: List[str]) -> pd.DataFrame:
     device_id = None
 
     for file in filenames:
-        df = pd.read_csv(file)
+        df = _read_csv(file)
 
         # Drop last column (timestamp_s)
         df = df.iloc[:, :-1].reset_index(drop=True)
@@ -129,7 +193,7 @@ def load_and_prepare_data_with_reference(
     """
 
     # --- Reference averages ---
-    ref_df = pd.read_csv(reference).iloc[:, :-1]
+    ref_df = _read_csv(reference).iloc[:, :-1]
     if take_last_n > 0:
         ref_df = ref_df.tail(take_last_n)
     ref_means = ref_df[normalize_cols].mean()
@@ -138,7 +202,7 @@ def load_and_prepare_data_with_reference(
     device_id = extract_device_id(reference)
 
     for file in filenames:
-        df = pd.read_csv(file).iloc[:, :-1].reset_index(drop=True)
+        df = _read_csv(file).iloc[:, :-1].reset_index(drop=True)
 
         # relative_time
         df["relative_time"] = df.index.to_numpy()
@@ -157,3 +221,99 @@ def load_and_prepare_data_with_reference(
     combined["device_id"] = device_id
 
     return combined
+
+
+# --- Chunked loading (bounded memory for long, e.g. 24H, logs) ---
+
+
+def iter_prepared_chunks(file: str, chunksize: int = 10_000) -> Iterator[pd.DataFrame]:
+    """
+    Stream one CSV in chunks of `chunksize` rows, cleaned the same way as
+    `load_and_prepare_data` (last column dropped, relative_time and scenario added).
+    relative_time continues across chunk boundaries.
+    """
+    scenario = extract_scenario(file)
+    offset = 0
+
+    for df in _read_csv_chunks(file, chunksize):
+        df = df.iloc[:, :-1].reset_index(drop=True)
+        df["relative_time"] = np.arange(offset, offset + len(df))
+        offset += len(df)
+        df["scenario"] = scenario
+        yield df
+
+
+def load_and_prepare_data_chunked(filenames: List[str], chunksize: int = 10_000) -> Iterator[pd.DataFrame]:
+    """
+    Chunked version of `load_and_prepare_data`: yields row chunks file by file
+    instead of concatenating everything, so only one chunk is held at a time.
+    """
+    if not filenames:
+        return
+    device_id = extract_device_id(filenames[0])
+
+    for file in filenames:
+        for df in iter_prepared_chunks(file, chunksize):
+            df["device_id"] = device_id
+            yield df
+
+
+def reference_means_chunked(
+    reference: str,
+    normalize_cols: List[str],
+    take_last_n: int = -1,
+    chunksize: int = 10_000,
+) -> pd.Series:
+    """
+    Column means of a reference file, computed incrementally chunk by chunk.
+    With `take_last_n` > 0 only a rolling tail of that many rows is kept;
+    otherwise running sums and counts are used.
+    """
+    tail = None
+    sums = None
+    counts = None
+
+    for df in _read_csv_chunks(reference, chunksize):
+        df = df.iloc[:, :-1][normalize_cols]
+        if take_last_n > 0:
+            tail = df if tail is None else pd.concat([tail, df])
+            tail = tail.tail(take_last_n)
+        else:
+            sums = df.sum() if sums is None else sums + df.sum()
+            counts = df.count() if counts is None else counts + df.count()
+
+    if take_last_n > 0:
+        return tail.mean()
+    return sums / counts
+
+
+def load_and_prepare_data_with_reference_chunked(
+    filenames: List[str],
+    reference: str,
+    take_last_n: int = -1,
+    normalize_cols: List[str] = [
+        "BME688_R",
+        "ENS160_R0",
+        "ENS160_R1",
+        "ENS160_R2",
+        "ENS160_R3",
+    ],
+    normalize_fn=DEFAULT_NORMALIZE_FN,
+    chunksize: int = 10_000,
+) -> Iterator[pd.DataFrame]:
+    """
+    Chunked version of `load_and_prepare_data_with_reference`: yields normalized
+    row chunks file by file. The reference means are computed up front, also in chunks.
+    """
+    ref_means = reference_means_chunked(reference, normalize_cols, take_last_n, chunksize)
+    device_id = extract_device_id(reference)
+
+    for file in filenames:
+        for df in iter_prepared_chunks(file, chunksize):
+            # Apply normalization function
+            for col in normalize_cols:
+                if col in df.columns:
+                    df[col] = normalize_fn(df[col], ref_means[col])
+
+            df["device_id"] = device_id
+            yield df
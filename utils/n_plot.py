@@ -1,22 +1,27 @@
 import pandas as pd
 import plotly.graph_objs as go
 from plotly.subplots import make_subplots
-from dash import Dash, dcc, html
+from dash import Dash, Input, Output, dcc, html
 import re
-from typing import List, Optional, Dict, Union
+from typing import TYPE_CHECKING, List, Optional, Dict, Union
 import plotly.express as px
 import plotly.colors as pc
 import numpy as np
 
+if TYPE_CHECKING:
+    from utils.similarity import ExposureIndex
+
 
 def create_per_device_app(
     data_dict: Dict[str, pd.DataFrame],
     titles: Optional[Union[Dict[str, str], List[str]]] = None,
     master_title: str = "Sensor Comparison Dashboard",
+    compress: bool = False,
 ):
     """
     Dash app for visualizing multiple device DataFrames with scenarios,
     dynamic sensor selection, and distinct colors per trace.
+    `compress` gzips every response (needs flask-compress, i.e. `dash[compress]`).
     """
     device_ids = list(data_dict.keys())
 
@@ -113,7 +118,7 @@ def create_per_device_app(
     )
 
     # --- Dash App ---
-    app = Dash(__name__)
+    app = Dash(__name__, compress=compress)
     app.layout = html.Div(
         [
             dcc.Graph(id="my-graph", figure=fig),
@@ -128,11 +133,13 @@ def create_per_device_app(
 def create_grouped_app(
     data_dict: Dict[str, pd.DataFrame],
     master_title: str = "Scenario Grouped Comparison Dashboard",
+    compress: bool = False,
 ):
     """
     Dash app for visualizing multiple device DataFrames on a single plot.
     Groups exposures by scenario, shows replicates as shaded spreads,
     and group means as colored lines (no resampling).
+    `compress` gzips every response (needs flask-compress, i.e. `dash[compress]`).
     """
     combined = pd.concat(data_dict.values(), ignore_index=True)
 
@@ -259,6 +266,41 @@ def create_grouped_app(
     )
 
     # --- Dash app ---
-    app = Dash(__name__)
+    app = Dash(__name__, compress=compress)
     app.layout = html.Div([dcc.Graph(id="my-graph", figure=fig)])
     return app
+
+
+def add_similarity_panel(app: Dash, index: "ExposureIndex", k: int = 5):
+    """
+    Append a "find similar" panel to an app from `create_per_device_app` or
+    `create_grouped_app`: pick an indexed exposure, list its `k` nearest neighbours.
+    """
+    key_sep = "||"
+    options = [
+        {"label": f"{device_id} | {scenario} ({campaign})", "value": key_sep.join((campaign, device_id, scenario))}
+        for campaign, device_id, scenario in index.keys
+    ]
+
+    panel = html.Div(
+        [
+            html.H3("Find similar exposures"),
+            dcc.Dropdown(id="similar-exposure", options=options, placeholder="Select an exposure..."),
+            html.Div(id="similar-results"),
+        ],
+        style={"marginTop": "20px"},
+    )
+    app.layout.children = list(app.layout.children or []) + [panel]
+
+    @app.callback(Output("similar-results", "children"), Input("similar-exposure", "value"))
+    def show_similar(value):
+        if not value:
+            return "Select an exposure to list the most similar ones across devices and campaigns."
+
+        key = tuple(value.split(key_sep))
+        rows = [
+            html.Tr([html.Td(f"{distance:.3f}"), html.Td(device_id), html.Td(scenario), html.Td(campaign)])
+            for (campaign, device_id, scenario), distance in index.similar_to(key, k=k)
+        ]
+        header = html.Tr([html.Th("Distance"), html.Th("Device"), html.Th("Scenario"), html.Th("Campaign")])
+        return html.Table([header] + rows)
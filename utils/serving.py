@@ -0,0 +1,218 @@
+import gzip
+import hashlib
+import inspect
+import os
+import pickle
+import tempfile
+from typing import Any, Callable, Dict, List, Optional
+
+from plotly.io.json import to_json_plotly
+from dash import Dash, html
+from flask import Response, request
+
+from utils.file_opener import source_path
+
+
+def fingerprint(*parts: Any) -> str:
+    """Return a short, stable hash of any repr-able values (settings, file lists, ...)."""
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def source_fingerprint(*paths: str) -> str:
+    """
+    Hash the contents of Python sources (files, or every .py file in a folder), so
+    cache keys change when the code that produced a cached value is edited.
+    """
+    digest = hashlib.sha1()
+    for path in paths:
+        files = [path] if os.path.isfile(path) else [
+            os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".py")
+        ]
+        for file in files:
+            with open(file, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def function_fingerprint(fn: Callable) -> str:
+    """
+    Hash a function's source text, so editing any part of it (constants included,
+    which `__code__.co_code` leaves out) changes the cache keys that depend on it.
+    """
+    try:
+        return fingerprint(inspect.getsource(fn))
+    except (OSError, TypeError):  # no source file (interactive session, builtin, ...)
+        code = fn.__code__
+        return fingerprint(code.co_code, [c for c in code.co_consts if not inspect.iscode(c)], code.co_names)
+
+
+def files_fingerprint(filenames: List[str]) -> str:
+    """
+    Hash a list of files by path, size and modification time, so a cache key
+    changes as soon as any input CSV is added, removed or rewritten. Files read
+    from a campaign archive are stamped with the archive's size and mtime.
+    """
+    stats = []
+    for file in sorted(filenames):
+        st = os.stat(source_path(file))
+        stats.append((os.path.basename(file), st.st_size, st.st_mtime_ns))
+    return fingerprint(stats)
+
+
+class DiskCache:
+    """
+    Small on-disk key/value store with least-recently-used eviction.
+
+    Entries are plain files in `cache_dir`, so every worker process (and every
+    restart) reads the same data instead of rebuilding its own copy. Writes are
+    atomic (temp file + rename) and reads refresh the file's mtime, which is what
+    eviction orders by.
+    """
+
+    def __init__(self, cache_dir: str, max_entries: int = 32):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.bin")
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                payload = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            pass  # evicted by another worker since the read; the payload is still valid
+        return payload
+
+    def set(self, key: str, payload: bytes) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, self._path(key))
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = [
+            os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir) if name.endswith(".bin")
+        ]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=os.path.getmtime)
+        for path in entries[: len(entries) - self.max_entries]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # another worker got there first
+
+    def get_or_build(self, key: str, builder: Callable[[], Any]) -> Any:
+        """Return the unpickled value for `key`, calling `builder()` and storing its result on a miss."""
+        payload = self.get(key)
+        if payload is not None:
+            return pickle.loads(payload)
+        value = builder()
+        self.set(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        return value
+
+
+def create_cached_app(
+    app_builder: Callable[..., Dash],
+    load_data: Callable[[], Dict[str, Any]],
+    cache: DiskCache,
+    key: str,
+    setup: Optional[Callable[[Dash], None]] = None,
+    **builder_kwargs,
+) -> Dash:
+    """
+    Build a Dash app whose layout (including the figure) is serialized once and
+    served as precomputed, gzip-compressed JSON. All other responses (callbacks,
+    JS bundles) are compressed by Dash itself (`compress=True`, flask-compress).
+
+    `app_builder` is `create_per_device_app` or `create_grouped_app`, called with
+    `load_data()`. On a cache hit neither the data is loaded nor the figure
+    rebuilt; the stored payload is served as-is.
+    `setup(app)` runs on both paths to register callbacks (e.g. `add_similarity_panel`);
+    anything it changes in the layout must also be reflected in `key`.
+    """
+    layout_key = f"layout-{fingerprint(key, app_builder.__name__, builder_kwargs)}"
+    payload = cache.get(layout_key)
+
+    if payload is None:
+        app = app_builder(load_data(), compress=True, **builder_kwargs)
+        if setup is not None:
+            setup(app)
+        layout_json = to_json_plotly(app.layout)  # uses orjson when installed
+        payload = gzip.compress(layout_json.encode("utf-8"), compresslevel=6)
+        cache.set(layout_key, payload)
+    else:
+        app = Dash(__name__, compress=True)
+        app.layout = html.Div()  # never sent; the cached layout is served instead
+        if setup is not None:
+            setup(app)
+
+    _serve_precomputed_layout(app, payload, etag=layout_key)
+    return app
+
+
+def _serve_precomputed_layout(app: Dash, gzipped_layout: bytes, etag: str) -> None:
+    """Answer `_dash-layout` requests with the precomputed payload instead of re-serializing per request."""
+    layout_path = f"{app.config.routes_pathname_prefix}_dash-layout"
+    plain_layout: List[bytes] = []  # decompressed lazily, only for clients without gzip
+
+    @app.server.before_request
+    def _precomputed_layout():
+        if request.path != layout_path:
+            return None
+        if request.if_none_match.contains(etag):
+            return Response(status=304)
+
+        if "gzip" in request.headers.get("Accept-Encoding", ""):
+            response = Response(gzipped_layout, mimetype="application/json")
+            response.headers["Content-Encoding"] = "gzip"
+        else:
+            if not plain_layout:
+                plain_layout.append(gzip.decompress(gzipped_layout))
+            response = Response(plain_layout[0], mimetype="application/json")
+        response.headers["Vary"] = "Accept-Encoding"
+        response.set_etag(etag)
+        return response
+
+
+def serve_app(app: Dash, host: str = "0.0.0.0", port: int = 8050, workers: int = 4) -> None:
+    """
+    Serve a Dash app for several users at once.
+
+    Uses gunicorn (Linux/macOS) with the app preloaded in the master process, so
+    the data and figure are built once and shared copy-on-write by all `workers`.
+    Falls back to waitress (Windows) with `workers` threads in a single process.
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        BaseApplication = None
+
+    if BaseApplication is not None:
+
+        class _PreloadedApplication(BaseApplication):
+            def load_config(self):
+                self.cfg.set("bind", f"{host}:{port}")
+                self.cfg.set("workers", workers)
+                self.cfg.set("preload_app", True)
+
+            def load(self):
+                return app.server
+
+        _PreloadedApplication().run()
+        return
+
+    try:
+        from waitress import serve
+    except ImportError:
+        raise ImportError("Production serving needs `gunicorn` (Linux/macOS) or `waitress` (Windows) installed")
+
+    serve(app.server, host=host, port=port, threads=workers)
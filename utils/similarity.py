@@ -0,0 +1,186 @@
+import os
+import tempfile
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.file_opener import extract_scenario
+from utils.serving import files_fingerprint, fingerprint, source_fingerprint
+
+FINGERPRINT_SENSORS = ["BME688_R", "ENS160_R0", "ENS160_R1", "ENS160_R2", "ENS160_R3"]
+FINGERPRINT_POINTS = 16  # samples per sensor, so vectors are len(sensors) * points long
+
+
+def fingerprint_series(values: np.ndarray, n_points: int = FINGERPRINT_POINTS) -> np.ndarray:
+    """
+    Reduce a series of any length to `n_points` values: the mean of each of
+    `n_points` equal segments, or linear interpolation for shorter series.
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return np.zeros(n_points)
+    if len(values) >= n_points:
+        return np.array([segment.mean() for segment in np.array_split(values, n_points)])
+    return np.interp(np.linspace(0, len(values) - 1, n_points), np.arange(len(values)), values)
+
+
+def fingerprint_exposures(
+    df: pd.DataFrame,
+    sensors: List[str] = FINGERPRINT_SENSORS,
+    n_points: int = FINGERPRINT_POINTS,
+) -> Dict[str, np.ndarray]:
+    """
+    Turn each scenario (exposure) of a device DataFrame into a fixed-length vector,
+    one block of `n_points` per sensor. Missing sensors contribute zeros.
+    """
+    fingerprints = {}
+    for scenario, gdf in df.groupby("scenario", sort=False):
+        gdf = gdf.sort_values("relative_time")
+        blocks = [
+            fingerprint_series(gdf[sensor].to_numpy(), n_points) if sensor in gdf.columns else np.zeros(n_points)
+            for sensor in sensors
+        ]
+        fingerprints[scenario] = np.concatenate(blocks)
+    return fingerprints
+
+
+class ExposureIndex:
+    """
+    Persistent nearest-neighbour index of exposure fingerprints, stored as one .npz file.
+
+    Each entry is keyed by (campaign, device_id, scenario) and remembers a `source`
+    signature (input file, normalisation and fingerprint settings, code) so it can
+    be refit when any of them changes. Queries are an exact
+    brute-force L2 search over a float32 matrix, which takes well under a
+    millisecond for thousands of exposures, so no extra dependency is needed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.keys: List[Tuple[str, str, str]] = []
+        self.sources: List[str] = []
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+
+        if os.path.exists(path):
+            with np.load(path) as stored:
+                self.vectors = stored["vectors"]
+                self.keys = [
+                    (str(campaign), str(device_id), str(scenario))
+                    for campaign, device_id, scenario in zip(stored["campaign"], stored["device_id"], stored["scenario"])
+                ]
+                # Indexes saved without sources get refit on the next update
+                self.sources = [str(source) for source in stored["source"]] if "source" in stored else [""] * len(self.keys)
+        self._positions = {key: i for i, key in enumerate(self.keys)}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: Tuple[str, str, str]) -> bool:
+        return key in self._positions
+
+    def source_of(self, key: Tuple[str, str, str]) -> Optional[str]:
+        """The source signature an entry was fingerprinted from, or None if not indexed."""
+        return self.sources[self._positions[key]] if key in self._positions else None
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        self.keys, self.sources, self._positions = [], [], {}
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+
+    def add(self, key: Tuple[str, str, str], vector: np.ndarray, source: str = "") -> None:
+        """
+        Insert a fingerprint, replacing any existing entry with the same key.
+
+        A fingerprint of another length than the stored ones (FINGERPRINT_SENSORS or
+        FINGERPRINT_POINTS changed) cannot be compared with them, so the index is
+        dropped and rebuilt from this entry on; other campaigns are refit when next indexed.
+        """
+        vector = np.asarray(vector, dtype=np.float32)
+        if len(self.keys) and vector.shape[0] != self.vectors.shape[1]:
+            self.clear()
+
+        if key in self._positions:
+            self.vectors[self._positions[key]] = vector
+            self.sources[self._positions[key]] = source
+            return
+        self._positions[key] = len(self.keys)
+        self.keys.append(key)
+        self.sources.append(source)
+        self.vectors = np.vstack([self.vectors.reshape(-1, vector.shape[0]), vector])
+
+    def save(self) -> None:
+        """Write the index atomically, so readers in other processes never see a partial file."""
+        folder = os.path.dirname(self.path) or "."
+        os.makedirs(folder, exist_ok=True)
+        campaign, device_id, scenario = (list(col) for col in zip(*self.keys)) if self.keys else ([], [], [])
+
+        fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(
+                f,
+                vectors=self.vectors,
+                campaign=np.array(campaign, dtype=str),
+                device_id=np.array(device_id, dtype=str),
+                scenario=np.array(scenario, dtype=str),
+                source=np.array(self.sources, dtype=str),
+            )
+        os.replace(tmp_path, self.path)
+
+    def query(
+        self,
+        vector: np.ndarray,
+        k: int = 5,
+        exclude: Optional[Tuple[str, str, str]] = None,
+    ) -> List[Tuple[Tuple[str, str, str], float]]:
+        """Return the `k` nearest entries as (key, distance) pairs, closest first."""
+        if not self.keys:
+            return []
+        distances = np.linalg.norm(self.vectors - np.asarray(vector, dtype=np.float32), axis=1)
+        if exclude in self._positions:
+            distances[self._positions[exclude]] = np.inf
+
+        k = min(k, len(distances))
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest])]
+        return [(self.keys[i], float(distances[i])) for i in nearest if np.isfinite(distances[i])]
+
+    def similar_to(self, key: Tuple[str, str, str], k: int = 5) -> List[Tuple[Tuple[str, str, str], float]]:
+        """Nearest neighbours of an already indexed exposure, excluding itself."""
+        return self.query(self.vectors[self._positions[key]], k=k, exclude=key)
+
+
+def index_exposures(
+    index: ExposureIndex,
+    campaign: str,
+    device_id: str,
+    filenames: List[str],
+    load_fn: Callable[[List[str]], pd.DataFrame],
+    settings: str,
+) -> int:
+    """
+    Fingerprint and insert the exposures in `filenames` that are not indexed yet,
+    or whose file or normalisation changed since they were. `load_fn` loads and
+    normalises a list of files the same way the dashboard does; `settings` is a
+    signature of everything it depends on besides the file itself (reference
+    files, normalisation function, ...). The fingerprint settings and the code in
+    utils/ are part of each entry's signature too. Returns the number of exposures (re)fit.
+    """
+    # Copies of a file (e.g. "...(1).csv") share a scenario and load as one exposure
+    scenario_files: Dict[str, List[str]] = {}
+    for file in filenames:
+        scenario_files.setdefault(extract_scenario(file), []).append(file)
+
+    code = fingerprint(FINGERPRINT_SENSORS, FINGERPRINT_POINTS, source_fingerprint(os.path.dirname(os.path.abspath(__file__))))
+    sources = {
+        scenario: fingerprint(files_fingerprint(files), settings, code) for scenario, files in scenario_files.items()
+    }
+    stale = [scenario for scenario in scenario_files if index.source_of((campaign, device_id, scenario)) != sources[scenario]]
+    if not stale:
+        return 0
+
+    fingerprints = fingerprint_exposures(load_fn([file for scenario in stale for file in scenario_files[scenario]]))
+    for scenario, vector in fingerprints.items():
+        index.add((campaign, device_id, scenario), vector, source=sources[scenario])
+    return len(fingerprints)